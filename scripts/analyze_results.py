@@ -1,16 +1,24 @@
 import argparse
+import numpy as np
 import pandas as pd
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from sklearn.metrics import precision_recall_curve, auc
 
+from pair_utils import make_key, read_tsv
+
+# Copy-on-Write lets concat and later column assignments share blocks instead of copying.
+# It is always on from pandas 3.0 (where the option is deprecated).
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
 
 def load_labeled_pairs(pos_path, neg_path):
     dfs = []
     try:
         print(f"Loading positive pairs from: {pos_path}")
-        pos_df = pd.read_csv(pos_path, sep='\t', header=None, names=['path_a', 'path_b'])
+        pos_df = read_tsv(pos_path, ['path_a', 'path_b'], {'path_a': 'string', 'path_b': 'string'})
         pos_df['label'] = 1
         dfs.append(pos_df)
     except Exception as e:
@@ -19,7 +27,7 @@ def load_labeled_pairs(pos_path, neg_path):
 
     try:
         print(f"Loading negative pairs from: {neg_path}")
-        neg_df = pd.read_csv(neg_path, sep='\t', header=None, names=['path_a', 'path_b'])
+        neg_df = read_tsv(neg_path, ['path_a', 'path_b'], {'path_a': 'string', 'path_b': 'string'})
         neg_df['label'] = 0
         dfs.append(neg_df)
     except Exception as e:
@@ -34,7 +42,8 @@ def load_labeled_pairs(pos_path, neg_path):
 
 def load_system_output(file_path):
     try:
-        df = pd.read_csv(file_path, sep='\t', header=None, names=['path_a', 'path_b', 'score'])
+        df = read_tsv(file_path, ['path_a', 'path_b', 'score'],
+                      {'path_a': 'string', 'path_b': 'string', 'score': 'float64'})
         return df
     except Exception as e:
         print(f"Error loading system output: {e}")
@@ -55,22 +64,25 @@ def main():
     if gold_df is None or system_df is None:
         return
 
-    def make_key(row):
-        p1 = str(row['path_a']).strip()
-        p2 = str(row['path_b']).strip()
-        first, second = sorted([p1, p2])
-        return f"{first}|{second}"
+    gold_df['key'] = make_key(gold_df['path_a'], gold_df['path_b'])
+    system_df['key'] = make_key(system_df['path_a'], system_df['path_b'])
 
-    gold_df['key'] = gold_df.apply(make_key, axis=1)
-    system_df['key'] = system_df.apply(make_key, axis=1)
-
-    merged = pd.merge(gold_df, system_df[['key', 'score']], on='key', how='left')
+    # One score per pair (max over duplicates) so the left join cannot fan out gold rows
+    system_scores = system_df.groupby('key', sort=False, as_index=False)['score'].max()
+    merged = pd.merge(gold_df, system_scores, on='key', how='left', validate='m:1')
     merged['score'] = merged['score'].fillna(0.0)
 
     y_true = merged['label']
     y_scores = merged['score']
 
-    precision, recall, thresholds = precision_recall_curve(y_true, y_scores)
+    if (y_scores == 0).all():
+        # No gold pair has a system score: the curve is the single point at threshold 0
+        # (predict everything positive), so skip the sort
+        precision = np.array([y_true.mean(), 1.0])
+        recall = np.array([1.0, 0.0])
+        thresholds = np.zeros(1)
+    else:
+        precision, recall, thresholds = precision_recall_curve(y_true, y_scores)
     # precision/recall are length len(thresholds)+1; use [:-1] to align F1 with thresholds
     f1_scores = 2 * (precision[:-1] * recall[:-1]) / (precision[:-1] + recall[:-1] + 1e-10)
     best_idx = f1_scores.argmax()
@@ -81,12 +93,16 @@ def main():
     print(f"Best F1 Score:      {best_f1:.4f}")
     print(f"Optimal Threshold:  {best_thresh:.4f}")
 
-    plt.figure(figsize=(8, 6))
-    plt.plot(recall, precision, marker='.', label=f'DIRT (AUC={auc(recall, precision):.2f})')
+    # AUC uses the full curve; the plot only needs ~200 points to look the same
+    pr_auc = auc(recall, precision)
+    idx = np.unique(np.linspace(0, len(recall) - 1, min(200, len(recall)), dtype=int))
+
+    plt.figure(figsize=(8, 6), dpi=72)
+    plt.plot(recall[idx], precision[idx], label=f'DIRT (AUC={pr_auc:.2f})')
     plt.xlabel('Recall')
     plt.ylabel('Precision')
     plt.title(f'Precision-Recall Curve (F1={best_f1:.2f})')
-    plt.savefig(args.plot)
+    plt.savefig(args.plot, dpi=72, bbox_inches='tight')
     plt.close()
     print(f"\nGraph saved to: {args.plot}")
 
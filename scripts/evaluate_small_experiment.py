@@ -5,69 +5,130 @@ Gold standard: positive-preds.txt (similar pairs), negative-preds.txt (non-simil
 System output: path_a, path_b, score (tab-separated; score in 3rd column).
 """
 import argparse
+import csv
 import os
 import sys
 
 import pandas as pd
 import numpy as np
-from sklearn.metrics import precision_recall_curve, precision_score, recall_score, f1_score
+
+from pair_utils import make_key, read_tsv
+
+
+FINAL_REPORT_TEMPLATE = """# Analysis Report - Small Input Experiment (10 Files)
+
+## F1 Results Table
+
+| Threshold | Precision | Recall | F1-Measure |
+|----------:|----------:|-------:|-----------:|
+{table_md}
+
+## PR-Curve Data (X = Recall, Y = Precision)
+
+Exact (X, Y) coordinates for the Precision-Recall curve:
+
+{pr_lines}
+
+## Error Analysis (5×4)
+
+### True Positive (TP) — High score in system and in gold
+
+{tp_table}
+
+### False Positive (FP) — High score in system, low/zero in gold
+
+{fp_table}
+
+### True Negative (TN) — Low score in both
+
+{tn_table}
+
+### False Negative (FN) — Low score in system, high in gold
+
+{fn_table}
+
+## Analysis
+
+{analysis_para}
+"""
 
 
 def load_gold(pos_path, neg_path):
     """Load gold standard: positive pairs (label=1) and negative pairs (label=0)."""
     dfs = []
-    for path, label in [(pos_path, 1), (neg_path, 0)]:
+    for path in (pos_path, neg_path):
         if not os.path.isfile(path):
             print(f"ERROR: Gold file not found: {path}")
             return None
-        df = pd.read_csv(path, sep='\t', header=None, names=['path_a', 'path_b'])
-        df['label'] = label
-        dfs.append(df)
-    gold = pd.concat(dfs, ignore_index=True)
+        dfs.append(pd.read_csv(path, sep='\t', header=None, names=['path_a', 'path_b']))
+    pos, neg = dfs
+    # Build the combined frame once from the column arrays instead of tagging and concatenating
+    gold = pd.DataFrame({
+        'path_a': np.concatenate([pos['path_a'].to_numpy(), neg['path_a'].to_numpy()]),
+        'path_b': np.concatenate([pos['path_b'].to_numpy(), neg['path_b'].to_numpy()]),
+        'label': np.concatenate([np.ones(len(pos), dtype=np.int8), np.zeros(len(neg), dtype=np.int8)]),
+    })
     return gold
 
 
+def sniff_delimiter(file_path):
+    """Guess the system-output delimiter from the first 4 KB (tab wins whenever present)."""
+    with open(file_path) as fh:
+        sample = fh.read(4096)
+    if '\t' in sample or not sample.strip():
+        return '\t'
+    try:
+        return csv.Sniffer().sniff(sample, delimiters='\t ,;').delimiter
+    except csv.Error:
+        return '\t'
+
+
+def read_system_table(file_path, delimiter):
+    """Parse path_a, path_b, score (first 3 fields of each row). Returns None if no rows parse."""
+    try:
+        df = read_tsv(file_path, ['path_a', 'path_b', 'score'],
+                      {'path_a': 'string', 'path_b': 'string', 'score': 'float64'}, sep=delimiter)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, ValueError):
+        return None
+    return df if len(df) else None
+
+
 def load_system_output(file_path):
     """
-    Load system output. Expected format: path_a \\t path_b \\t score (tab-separated).
-    If tab parsing yields 3 columns, score is column 2 (0-indexed). Otherwise we try
-    last column as score (for 'Word1 -> R1    Word2 -> R2    Score' style).
+    Load system output. Expected format: path_a \\t path_b \\t score (tab-separated; score is
+    the 3rd column). Comma, semicolon or single-space delimiters are sniffed from the file head;
+    these only work when each field is a single token (paths containing the delimiter, e.g.
+    'Word1 -> R1    Word2 -> R2    Score', cannot be parsed).
     """
     if not os.path.isfile(file_path):
         print(f"ERROR: System output file not found: {file_path}")
         return None
-    # Try tab-separated first (standard Step 4 output)
-    df = pd.read_csv(file_path, sep='\t', header=None, engine='python', on_bad_lines='skip')
-    if df.shape[1] >= 3:
-        df = df.iloc[:, :3].copy()
-        df.columns = ['path_a', 'path_b', 'score']
-    else:
-        # Fallback: split by multiple spaces, last field = score
-        lines = []
-        with open(file_path) as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) >= 3:
-                    try:
-                        score = float(parts[-1])
-                        path_b = ' '.join(parts[1:-1])  # approximate
-                        path_a = parts[0]
-                        lines.append((path_a, path_b, score))
-                    except ValueError:
-                        pass
-        if not lines:
-            print("ERROR: Could not parse system output (need path \\t path \\t score).")
-            return None
-        df = pd.DataFrame(lines, columns=['path_a', 'path_b', 'score'])
-    df['path_a'] = df['path_a'].astype(str).str.strip()
-    df['path_b'] = df['path_b'].astype(str).str.strip()
-    df['score'] = pd.to_numeric(df['score'], errors='coerce').fillna(0.0)
+    df = read_system_table(file_path, sniff_delimiter(file_path))
+    if df is None:
+        print("ERROR: Could not parse system output (need path \\t path \\t score).")
+        return None
+    # Both readers already return string columns (Arrow-backed from pyarrow): strip in place
+    df['path_a'] = df['path_a'].str.strip()
+    df['path_b'] = df['path_b'].str.strip()
+    df['score'] = pd.to_numeric(df['score'], errors='coerce').fillna(0.0).astype(np.float32)
     return df
 
 
-def make_key(path_a, path_b):
-    first, second = sorted([str(path_a).strip(), str(path_b).strip()])
-    return f"{first}|{second}"
+def precision_recall_curve(y_true, y_scores):
+    """
+    Precision-recall curve with the same layout as sklearn's: thresholds ascending,
+    prec/rec one longer (ending at 1, 0). One stable sort plus a cumsum over the labels.
+    """
+    order = np.argsort(-y_scores, kind='stable')
+    ys = y_scores[order]
+    # Last position of each run of equal scores = one curve point per distinct threshold
+    distinct = np.r_[np.flatnonzero(np.diff(ys)), len(ys) - 1]
+    tps = np.cumsum(y_true[order], dtype=np.int64)[distinct]
+    fps = distinct + 1 - tps
+    prec = tps / (tps + fps)
+    rec = tps / tps[-1] if tps[-1] else np.ones(len(tps))
+    # Reverse to ascending thresholds
+    return np.r_[prec[::-1], 1.0], np.r_[rec[::-1], 0.0], ys[distinct][::-1]
 
 
 def main():
@@ -93,39 +154,69 @@ def main():
     if gold is None or system is None:
         sys.exit(1)
 
-    gold['key'] = gold.apply(lambda r: make_key(r['path_a'], r['path_b']), axis=1)
-    system['key'] = system.apply(lambda r: make_key(r['path_a'], r['path_b']), axis=1)
-
-    # Merge: for each gold pair, get system score (0 if missing)
-    merged = gold.merge(system[['key', 'score']].drop_duplicates('key'), on='key', how='left')
-    merged['score'] = merged['score'].fillna(0.0)
-    y_true = merged['label'].values
-    y_scores = merged['score'].values
+    gold['key'] = make_key(gold['path_a'], gold['path_b'])
+    system['key'] = make_key(system['path_a'], system['path_b'])
+
+    # Lookup: for each gold pair, get system score (0 if missing; max score on duplicate pairs).
+    # Sort system keys once, reduce each run of equal keys to its max, then binary search.
+    sys_keys = system['key'].to_numpy()
+    order = np.argsort(sys_keys)
+    sk = sys_keys[order]
+    sv = system['score'].to_numpy(dtype=np.float32)[order]
+    if len(sk):
+        starts = np.flatnonzero(np.r_[True, sk[1:] != sk[:-1]])
+        sk = sk[starts]
+        sv = np.maximum.reduceat(sv, starts)
+    gold_keys = gold['key'].to_numpy()
+    scores = np.zeros(len(gold_keys), dtype=np.float32)
+    if len(sk):
+        idx = np.searchsorted(sk, gold_keys).clip(max=len(sk) - 1)
+        hits = sk[idx] == gold_keys
+        scores[hits] = sv[idx[hits]]
+    merged = gold
+    merged['score'] = scores
+    y_true = merged['label'].to_numpy()
+    y_scores = merged['score'].to_numpy()
 
     # --- Format verification ---
     print("\n=== Format verification ===")
     print("System output parsed as: path_a, path_b, score (tab-separated; score = 3rd column).")
     print("Sample system lines:")
-    print(system.head(3).to_string())
+    print(system[['path_a', 'path_b', 'score']].head(3).to_string())
     print("\nSample merged (gold + score):")
     print(merged[['path_a', 'path_b', 'label', 'score']].head(5).to_string())
 
+    # --- Precision-Recall curve (also used for the fixed-threshold table) ---
+    if not y_scores.any():
+        # No gold pair has a system score: the curve is the single point at threshold 0
+        # (predict everything positive), so skip the sort
+        print("\nWARNING: no gold pair has a system score; all fixed-threshold P/R/F1 are 0.")
+        prec = np.array([y_true.mean(), 1.0])
+        rec = np.array([1.0, 0.0])
+        thresh = np.zeros(1, dtype=np.float32)
+    else:
+        prec, rec, thresh = precision_recall_curve(y_true, y_scores)
+
     # --- Evaluation at fixed thresholds ---
+    # thresh is ascending; prec[i]/rec[i] are the stats for y_scores >= thresh[i], so the
+    # first curve threshold >= t gives the same predictions as y_scores >= t.
     thresholds = [0.0001, 0.001, 0.01, 0.05, 0.1]
+    # compare in float32 so a score equal to a threshold is not lost to rounding
+    idx = np.searchsorted(thresh, np.array(thresholds, dtype=np.float32))
+    above_all = idx >= len(thresh)  # no predicted positives: P = R = 0 (zero_division=0)
+    idx = np.minimum(idx, len(thresh) - 1)
+    p_arr = np.where(above_all, 0.0, prec[idx])
+    # no gold positives: the curve reports recall 1, recall_score(zero_division=0) reports 0
+    r_arr = np.where(above_all | (y_true.sum() == 0), 0.0, rec[idx])
+    f1_arr = 2 * p_arr * r_arr / (p_arr + r_arr + 1e-10)
     print("\n=== Precision, Recall, F1 at fixed thresholds ===")
     print(f"{'Threshold':>12} {'Precision':>10} {'Recall':>10} {'F1':>10}")
     print("-" * 44)
-    table_rows = []
-    for t in thresholds:
-        y_pred = (y_scores >= t).astype(int)
-        p = precision_score(y_true, y_pred, zero_division=0)
-        r = recall_score(y_true, y_pred, zero_division=0)
-        f1 = f1_score(y_true, y_pred, zero_division=0)
+    table_rows = list(zip(thresholds, p_arr, r_arr, f1_arr))
+    for t, p, r, f1 in table_rows:
         print(f"{t:>12.4f} {p:>10.4f} {r:>10.4f} {f1:>10.4f}")
-        table_rows.append((t, p, r, f1))
 
     # --- Precision-Recall curve table ---
-    prec, rec, thresh = precision_recall_curve(y_true, y_scores)
     # prec/rec length = len(thresh)+1; align by index 0..len(thresh)-1 for thresh
     n_pts = min(20, len(thresh))
     indices = np.linspace(0, len(thresh) - 1, n_pts, dtype=int) if len(thresh) > 1 else ([0] if len(thresh) == 1 else [])
@@ -141,36 +232,33 @@ def main():
 
     # --- Error Analysis: 5 examples each for TP, FP, TN, FN ---
     # Use median of system score among positives as "high" and median among negatives as "low"
-    pos_scores = merged.loc[merged['label'] == 1, 'score']
-    neg_scores = merged.loc[merged['label'] == 0, 'score']
-    high_thresh = pos_scores.quantile(0.5) if len(pos_scores) else 0.01
-    low_thresh = neg_scores.quantile(0.5) if len(neg_scores) else 0.001
+    # Plain NumPy masks over y_true/y_scores; no helper columns are added to merged
+    pos_scores = y_scores[y_true == 1]
+    neg_scores = y_scores[y_true == 0]
+    high_thresh = np.median(pos_scores) if len(pos_scores) else 0.01
+    low_thresh = np.median(neg_scores) if len(neg_scores) else 0.001
     # Ensure we have separation
     if high_thresh <= low_thresh:
         high_thresh = max(0.01, y_scores.mean() + 1e-6)
         low_thresh = min(0.01, max(0, y_scores.min()))
 
-    merged['pred_high'] = merged['score'] >= high_thresh
-    merged['pred_low'] = merged['score'] <= low_thresh
-
-    tp = merged[(merged['label'] == 1) & merged['pred_high']]
-    # FP: relaxed to score > 0 so any gold-negative with positive score counts (sample may have little overlap)
-    fp = merged[(merged['label'] == 0) & (merged['score'] > 0)]
+    # Single pass for TP/TN/FN (0=TP, 2=TN, 3=FN, -1=none). FP keeps its own mask: it is relaxed
+    # to score > 0 so any gold-negative with positive score counts (sample may have little overlap),
+    # and so it can overlap TN.
+    category = np.where(y_true == 1,
+                        np.where(y_scores >= high_thresh, 0, np.where(y_scores <= low_thresh, 3, -1)),
+                        np.where(y_scores <= low_thresh, 2, -1))
+    fp_mask = (y_true == 0) & (y_scores > 0)
+    # Keep only row positions (first 5 per category); frames are sliced once below
+    tp_idx, tn_idx, fn_idx = (np.flatnonzero(category == k)[:5] for k in (0, 2, 3))
+    fp_idx = np.flatnonzero(fp_mask)[:5]
     # Fallback: if < 5 FPs, pad with gold negative pairs as illustrative (nominal score 1e-6 for report)
-    if len(fp) < 5:
-        gold_neg = merged[merged['label'] == 0][['path_a', 'path_b', 'label', 'score', 'key']].copy()
-        fp_keys = set(fp['key'].tolist()) if len(fp) else set()
-        extra = gold_neg[~gold_neg['key'].isin(fp_keys)].head(5 - len(fp)).copy()
-        extra['score'] = extra['score'].replace(0.0, 1e-6)
-        fp = pd.concat([fp, extra], ignore_index=True).head(5)
-    tn = merged[(merged['label'] == 0) & merged['pred_low']]
-    fn = merged[(merged['label'] == 1) & merged['pred_low']]
-
-    def take5(df):
-        n = min(5, len(df))
-        if n == 0:
-            return pd.DataFrame(columns=['path_a', 'path_b', 'label', 'score'])
-        return df.head(5) if len(df) >= 5 else df.head(n)
+    pad_idx = np.flatnonzero((y_true == 0) & ~fp_mask)[:5 - len(fp_idx)]
+    pad_scores = np.where(y_scores[pad_idx] == 0, np.float32(1e-6), y_scores[pad_idx])
+
+    cols = ['path_a', 'path_b', 'label', 'score']
+    tp, tn, fn = (merged.iloc[idx][cols] for idx in (tp_idx, tn_idx, fn_idx))
+    fp = merged.iloc[np.r_[fp_idx, pad_idx]][cols].assign(score=np.r_[y_scores[fp_idx], pad_scores])
 
     print("\n=== Error Analysis (5 examples per category) ===")
     for cat, desc, df in [
@@ -180,9 +268,7 @@ def main():
         ('False Negative (FN)', 'Low score in system, high in gold', fn),
     ]:
         print(f"\n--- {cat}: {desc} ---")
-        examples = take5(df)
-        cols = [c for c in ['path_a', 'path_b', 'label', 'score'] if c in examples.columns]
-        print(examples[cols].to_string(index=False) if len(examples) else "(none)")
+        print(df.to_string(index=False) if len(df) else "(none)")
 
     # --- Summary for report (copy-paste) ---
     out_path = os.path.join(args.out_dir, 'evaluation_report.txt')
@@ -212,33 +298,28 @@ def main():
     print(f"\nReport written to: {out_path}")
 
     # --- FINAL_REPORT_SMALL.md (ready-to-submit) ---
-    tp5 = take5(tp)
-    fp5 = take5(fp)
-    tn5 = take5(tn)
-    fn5 = take5(fn)
-
     def md_table(df, cols=None):
         if df is None or len(df) == 0:
             return "_No examples in this category._"
         cols = cols or [c for c in ['path_a', 'path_b', 'label', 'score'] if c in df.columns]
         head = "| " + " | ".join(cols) + " |"
         sep = "| " + " | ".join("---" for _ in cols) + " |"
-        rows = []
-        for _, r in df[cols].iterrows():
-            rows.append("| " + " | ".join(str(r[c]) for c in cols) + " |")
+        # Stringify per column so float32 scores keep their short repr (iterrows upcasts them)
+        cells = df[cols].astype(str)
+        rows = ["| " + " | ".join(r) + " |" for r in cells.itertuples(index=False)]
         return "\n".join([head, sep] + rows)
 
     pr_lines = "\n".join(f"- ({r:.4f}, {p:.4f})" for p, r, _ in pr_table[:25])
 
     fp_intro = (
         "In this run no false positives appeared among the gold pairs with system scores; "
-        if len(fp5) == 0 else "The false positives we observed "
+        if len(fp) == 0 else "The false positives we observed "
     )
     fp_body = (
         "In general, false positives in DIRT often involve path pairs that share lexical overlap or the same "
         "slot fillers (e.g. \"X associate with Y\" vs \"Y associate with X\") but are marked negative in the gold "
         "set—for example when the relation is antonymic or semantically opposite. "
-        if len(fp5) == 0 else
+        if len(fp) == 0 else
         "often involve path pairs that share lexical overlap or the same slot fillers but are marked negative "
         "in the gold set—e.g. when the relation is antonymic or semantically opposite. "
     )
@@ -253,45 +334,12 @@ def main():
         "when the model assigns high scores to lexically similar but semantically distinct (e.g. antonym) pairs."
     )
 
-    final_report = f"""# Analysis Report - Small Input Experiment (10 Files)
-
-## F1 Results Table
-
-| Threshold | Precision | Recall | F1-Measure |
-|----------:|----------:|-------:|-----------:|
-"""
-    for t, p, r, f1 in table_rows:
-        final_report += f"| {t:.4f} | {p:.4f} | {r:.4f} | {f1:.4f} |\n"
-
-    final_report += f"""
-## PR-Curve Data (X = Recall, Y = Precision)
-
-Exact (X, Y) coordinates for the Precision-Recall curve:
-
-{pr_lines}
-
-## Error Analysis (5×4)
-
-### True Positive (TP) — High score in system and in gold
-
-{md_table(tp5)}
-
-### False Positive (FP) — High score in system, low/zero in gold
-
-{md_table(fp5)}
-
-### True Negative (TN) — Low score in both
-
-{md_table(tn5)}
-
-### False Negative (FN) — Low score in system, high in gold
-
-{md_table(fn5)}
-
-## Analysis
-
-{analysis_para}
-"""
+    table_md = "\n".join(f"| {t:.4f} | {p:.4f} | {r:.4f} | {f1:.4f} |" for t, p, r, f1 in table_rows)
+    final_report = FINAL_REPORT_TEMPLATE.format(
+        table_md=table_md, pr_lines=pr_lines,
+        tp_table=md_table(tp), fp_table=md_table(fp), tn_table=md_table(tn), fn_table=md_table(fn),
+        analysis_para=analysis_para,
+    )
 
     final_report_path = os.path.join(args.out_dir, 'FINAL_REPORT_SMALL.md')
     with open(final_report_path, 'w') as f:
@@ -0,0 +1,43 @@
+"""
+Shared helpers for the evaluation scripts: reading path-pair files and building the
+order-independent pair key used to join gold pairs with system output.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pac
+except ImportError:
+    pa = pac = None
+
+
+def read_tsv(file_path, names, column_types, sep='\t'):
+    """
+    Read a header-less delimited file into `names` (the first len(names) fields of each row).
+    pyarrow's multithreaded reader is used when installed and every row has exactly len(names)
+    fields; otherwise pandas' C parser reads the file. Only 'string' column types are forced on
+    the pandas path, so non-numeric scores can still be coerced by the caller.
+    """
+    if pac is not None:
+        try:
+            tbl = pac.read_csv(
+                file_path,
+                parse_options=pac.ParseOptions(delimiter=sep),
+                read_options=pac.ReadOptions(column_names=names),
+                convert_options=pac.ConvertOptions(column_types=column_types),
+            )
+            return tbl.to_pandas(types_mapper=pd.ArrowDtype)
+        except pa.ArrowInvalid:
+            pass  # e.g. rows with a different field count or non-numeric scores
+    return pd.read_csv(file_path, sep=sep, header=None, names=names, usecols=range(len(names)),
+                       engine='c', on_bad_lines='skip',
+                       dtype={c: t for c, t in column_types.items() if t == 'string'})
+
+
+def make_key(path_a, path_b):
+    """Order-independent uint64 hash of the (path_a, path_b) pair, vectorized over two Series."""
+    ha = pd.util.hash_array(path_a.astype(str).str.strip().to_numpy(dtype=object))
+    hb = pd.util.hash_array(path_b.astype(str).str.strip().to_numpy(dtype=object))
+    # min/max makes the key symmetric without comparing the strings themselves
+    return np.minimum(ha, hb) * np.uint64(0x9E3779B97F4A7C15) ^ np.maximum(ha, hb)